@@ -1,7 +1,13 @@
 # pamplemousse — macOS menu bar Pomodoro timer
 # pip install rumps pyobjc-framework-Cocoa pyobjc-framework-Quartz rich && python pamplemousse.py
 
+from __future__ import annotations
+
+import ctypes
+import functools
+import math
 import os
+import plistlib
 import shutil
 import signal
 import subprocess
@@ -10,27 +16,6 @@ import time
 from enum import Enum, auto
 from pathlib import Path
 
-import rumps
-from AppKit import (
-    NSBackingStoreBuffered,
-    NSBezierPath,
-    NSButton,
-    NSColor,
-    NSEvent,
-    NSFloatingWindowLevel,
-    NSFont,
-    NSGraphicsContext,
-    NSImage,
-    NSScreen,
-    NSSound,
-    NSTextField,
-    NSView,
-    NSWindow,
-    NSWindowStyleMaskBorderless,
-)
-from Foundation import NSObject, NSTimer as FoundationTimer
-from Quartz import CGEventSourceSecondsSinceLastEventType
-
 # CGEventSource constants
 _CG_EVENT_SOURCE_STATE_HID = 1
 _CG_EVENT_KEY_DOWN = 10
@@ -47,8 +32,20 @@ TIMER_FONT_SIZE = 200
 MOUSE_THRESHOLD = 3
 ARM_DELAY = 1.5
 
-# NSEventMask bits for mouse movement
-MOUSE_MOVE_MASK = (1 << 5) | (1 << 6) | (1 << 7) | (1 << 27)
+# NSTimer tolerances — let the OS coalesce our wakeups with other timers
+TICK_TOLERANCE = 0.25
+ARM_TOLERANCE = 0.2
+
+# Menu-bar tomato: distinct pie slices, then a 1 Hz blink for the final stretch
+ICON_STEPS = 60
+BLINK_SECS = 60
+
+# The icon and "remaining" item only need a redraw about once a minute
+DISPLAY_INTERVAL = 60
+DISPLAY_TOLERANCE = 15
+
+# NSEventMaskMouseMoved — all the green overlay needs to notice the user is back
+MOUSE_MOVE_MASK = 1 << 5
 
 # NSWindowCollectionBehavior flags
 CAN_JOIN_ALL_SPACES = 1 << 0
@@ -58,6 +55,10 @@ FULL_SCREEN_AUXILIARY = 1 << 4
 NS_TEXT_ALIGN_CENTER = 2
 NS_FONT_WEIGHT_BOLD = 0.4
 
+_ICON_RED = (1.0, 0.0, 0.0, 1.0)
+_ICON_DARK_RED = (0.6, 0.0, 0.0, 0.2)
+_ICON_STEM_GREEN = (0.2, 0.65, 0.2, 1.0)
+
 
 class TimerState(Enum):
     IDLE = auto()
@@ -68,27 +69,38 @@ class TimerState(Enum):
 # -- Pomodoro app -------------------------------------------------------------
 
 
-class PomodoroApp(rumps.App):
+# Not usable on its own: __init__ chains to rumps.App, which _make_app()
+# mixes in once the frameworks are loaded
+class PomodoroApp:
     def __init__(self) -> None:
         super().__init__("Pomodoro", title="🍅")
         self.work_mins = DEFAULT_WORK_MINS
         self.break_mins = DEFAULT_BREAK_MINS
-        self.timer = rumps.Timer(self.tick, 1)
         self.seconds_left = 0
         self.state = TimerState.IDLE
         self._break_overlay = None
         self._green_overlay = None
         self._total_work_seconds = self.work_mins * 60
+        self._break_total_seconds = self.break_mins * 60
         self._blink_state = False
-        self._last_work_tick = 0.0
+        self._status_image = None
+        self._icon_stale = False
+        self._occlusion_observer = None
+        self._time_left_shown = None
+        self._tick_timer = None
+        self._blinking = False
+        self._end_timer = None
+        self._deadline = 0.0
+        self._paused_remaining = 0.0
+        self._slept_at = None
 
         self.start_button = rumps.MenuItem("Start", callback=self.start)
         self.stop_button = rumps.MenuItem("Stop")
 
-        self.work_menu = self._build_duration_menu(
+        self.work_menu, self._work_selected = self._build_duration_menu(
             "Work Duration", WORK_DURATION_OPTIONS, self.work_mins, self.set_work,
         )
-        self.break_menu = self._build_duration_menu(
+        self.break_menu, self._break_selected = self._build_duration_menu(
             "Break Duration", BREAK_DURATION_OPTIONS, self.break_mins, self.set_break,
         )
 
@@ -107,20 +119,42 @@ class PomodoroApp(rumps.App):
         ]
         self.time_left_item._menuitem.setHidden_(True)
 
+        self._menu_delegate = _MenuDelegate.alloc().init()
+        self._menu_delegate._py_callback = self._refresh_time_left
+        self._menu._menu.setDelegate_(self._menu_delegate)
+
+        self._screen_observer = _observe(
+            NSNotificationCenter.defaultCenter(),
+            NSApplicationDidChangeScreenParametersNotification,
+            _screens_changed,
+        )
+
+        workspace_center = NSWorkspace.sharedWorkspace().notificationCenter()
+        self._sleep_observers = [
+            _observe(
+                workspace_center, NSWorkspaceWillSleepNotification, self._on_will_sleep,
+            ),
+            _observe(
+                workspace_center, NSWorkspaceDidWakeNotification, self._on_did_wake,
+            ),
+        ]
+
     @staticmethod
     def _build_duration_menu(
         title: str,
         options: list[int],
         default: int,
         callback,
-    ) -> rumps.MenuItem:
+    ) -> tuple[rumps.MenuItem, rumps.MenuItem | None]:
         menu = rumps.MenuItem(title)
+        selected = None
         for mins in options:
             item = rumps.MenuItem(f"{mins} min", callback=callback)
             if mins == default:
                 item.state = True
+                selected = item
             menu.add(item)
-        return menu
+        return menu, selected
 
     # -- Start / Pause / Resume / Stop state machine --------------------------
 
@@ -128,17 +162,23 @@ class PomodoroApp(rumps.App):
         if self.state == TimerState.IDLE:
             self._start_work_session()
         elif self.state == TimerState.RUNNING:
-            self.timer.stop()
+            now = _now()
+            self._paused_remaining = self._deadline - now
+            self.seconds_left = self._remaining(now)
+            self._set_time_left()
+            self._cancel_timers()
             self.state = TimerState.PAUSED
             self.start_button.title = "Resume"
         else:
-            self._last_work_tick = time.time()
-            self.timer.start()
+            now = _now()
+            self._deadline = now + self._paused_remaining
+            self._start_timers(now)
             self.state = TimerState.RUNNING
             self.start_button.title = "Pause"
 
     def stop(self, _sender) -> None:
-        self.timer.stop()
+        self._cancel_timers()
+        self._slept_at = None
         if self._break_overlay:
             self._break_overlay.dismiss()
             self._break_overlay = None
@@ -147,64 +187,164 @@ class PomodoroApp(rumps.App):
             self._green_overlay = None
             g.on_dismiss = lambda: None
             g.dismiss()
-        self._clear_tomato_icon()
         self.time_left_item._menuitem.setHidden_(True)
-        self.title = "🍅"
+        self._refresh_status("🍅", None)
         self.state = TimerState.IDLE
         self.start_button.title = "Start"
         self.start_button.set_callback(self.start)
         self.stop_button.set_callback(None)
 
-    # -- Work timer tick -------------------------------------------------------
+    # -- Work timer ------------------------------------------------------------
 
-    def tick(self, _sender) -> None:
-        now = time.time()
-        gap = now - self._last_work_tick
-        self._last_work_tick = now
-        if gap >= self.break_mins * 60:
-            self.timer.stop()
-            self._clear_tomato_icon()
-            self.time_left_item._menuitem.setHidden_(True)
-            self._start_work_session()
+    def _start_timers(self, now: float) -> None:
+        self._end_timer = _schedule_timer(
+            max(self._deadline - now, 0.0), False, self._on_work_done, TICK_TOLERANCE,
+        )
+        self.tick()
+
+    def _cancel_timers(self) -> None:
+        for timer in (self._tick_timer, self._end_timer):
+            if timer:
+                timer.invalidate()
+        self._tick_timer = None
+        self._blinking = False
+        self._end_timer = None
+
+    def _on_work_done(self) -> None:
+        self._cancel_timers()
+        self.seconds_left = 0
+        self.time_left_item._menuitem.setHidden_(True)
+        self._start_break_overlay()
+
+    def tick(self) -> None:
+        if not self._blinking:
+            self._tick_timer = None
+        now = _now()
+        self.seconds_left = self._remaining(now)
+        self._set_time_left()
+        self._update_tomato_icon()
+        if self._tick_timer is None:
+            self._schedule_tick(now)
+
+    def _schedule_tick(self, now: float) -> None:
+        """Display-only: on each minute boundary, then every second for the blink."""
+        s = self.seconds_left
+        if s <= 1:
+            return  # the end timer takes it from here
+        remaining = self._deadline - now
+        if s <= BLINK_SECS:
+            # One repeating timer for the blink, aligned to the countdown's
+            # seconds; the end timer cancels it
+            self._blinking = True
+            self._tick_timer = _schedule_timer(
+                1.0, True, self.tick, TICK_TOLERANCE, start=remaining - (s - 1),
+            )
             return
-        self.seconds_left -= 1
-        if self.seconds_left <= 0:
-            self.timer.stop()
-            self._clear_tomato_icon()
-            self.time_left_item._menuitem.setHidden_(True)
-            self._start_break_overlay()
+        # Land where the minute digit changes; the blink starts on one too
+        delay = remaining % DISPLAY_INTERVAL or DISPLAY_INTERVAL
+        if remaining - delay > BLINK_SECS:
+            tolerance = DISPLAY_TOLERANCE
         else:
-            self.time_left_item.title = _fmt(self.seconds_left) + " remaining"
-            self.title = ""
-            self._update_tomato_icon()
+            tolerance = TICK_TOLERANCE
+        self._tick_timer = _schedule_timer(delay, False, self.tick, tolerance)
+
+    def _on_will_sleep(self) -> None:
+        if self._end_timer is None:
+            return
+        self._cancel_timers()
+        self._slept_at = _now()
+
+    def _on_did_wake(self) -> None:
+        if self._slept_at is None:
+            return
+        now = _now()
+        slept = now - self._slept_at
+        self._slept_at = None
+        # Asleep for at least a break's length: count it as the break;
+        # anything shorter pauses the session rather than eating into it
+        if slept >= self._break_total_seconds:
+            self._start_work_session()
+        else:
+            self._deadline += slept
+            self._start_timers(now)
+
+    def _remaining(self, now: float) -> int:
+        return max(0, math.ceil(self._deadline - now))
+
+    def _refresh_time_left(self) -> None:
+        if self._end_timer is None:
+            return
+        self.seconds_left = self._remaining(_now())
+        self._set_time_left()
+
+    def _set_time_left(self) -> None:
+        if self.seconds_left == self._time_left_shown:
+            return
+        self._time_left_shown = self.seconds_left
+        self.time_left_item.title = _fmt(self.seconds_left) + " remaining"
 
     def _update_tomato_icon(self):
-        fraction = self.seconds_left / self._total_work_seconds
-        if self.seconds_left <= 60:
+        if not self._status_visible():
+            self._icon_stale = True
+            return
+        if self.seconds_left <= BLINK_SECS:
             self._blink_state = not self._blink_state
-            self._clear_tomato_icon()
-            self.title = "🍅" if self._blink_state else _fmt(self.seconds_left)
+            title = "🍅" if self._blink_state else _fmt(self.seconds_left)
+            self._refresh_status(title, None)
             return
-        image = _create_tomato_icon(fraction)
+        bucket = self.seconds_left * ICON_STEPS // self._total_work_seconds
+        self._refresh_status("", _tomato_icon_cached(bucket))
+
+    def _refresh_status(self, title: str, image) -> None:
+        """Apply title and icon together, then repaint the status button once."""
         try:
-            self._nsapp.nsstatusitem.button().setImage_(image)
+            button = self._nsapp.nsstatusitem.button()
         except AttributeError:
-            pass
-
-    def _clear_tomato_icon(self):
+            self.title = title
+            return
+        if title == self.title and image is self._status_image:
+            return
+        # Image first, so rumps never sees an empty title with no icon and
+        # falls back to showing the app name
+        if image is not self._status_image:
+            button.setImage_(image)
+            self._status_image = image
+        if title != self.title:
+            self.title = title
+        button.setNeedsDisplay_(True)
+        button.display()
+
+    def _status_visible(self) -> bool:
         try:
-            self._nsapp.nsstatusitem.button().setImage_(None)
+            window = self._nsapp.nsstatusitem.button().window()
         except AttributeError:
-            pass
+            return True
+        if window is None:
+            return True
+        if self._occlusion_observer is None:
+            self._occlusion_observer = _observe(
+                NSNotificationCenter.defaultCenter(),
+                NSWindowDidChangeOcclusionStateNotification,
+                self._on_status_occlusion_changed,
+                window,
+            )
+        return bool(window.occlusionState() & NSWindowOcclusionStateVisible)
+
+    def _on_status_occlusion_changed(self) -> None:
+        if not self._icon_stale or self._end_timer is None:
+            return
+        if self._status_visible():
+            self._icon_stale = False
+            self._update_tomato_icon()
 
     # -- Break / green overlay lifecycle ---------------------------------------
 
     def _start_break_overlay(self) -> None:
-        self.title = "☕"
+        self._refresh_status("☕", None)
         self.start_button.title = "On Break"
         self.start_button.set_callback(None)
         self._break_overlay = BreakOverlay(
-            self.break_mins * 60,
+            self._break_total_seconds,
             on_complete=self._on_break_complete,
             on_skip=self._on_break_skipped,
         )
@@ -213,7 +353,7 @@ class PomodoroApp(rumps.App):
     def _on_break_complete(self) -> None:
         self._break_overlay = None
         NSSound.soundNamed_("Glass").play()
-        self.title = "✓"
+        self._refresh_status("✓", None)
         self._green_overlay = GreenOverlay(on_dismiss=self._on_green_dismissed)
         self._green_overlay.show()
 
@@ -228,43 +368,55 @@ class PomodoroApp(rumps.App):
     def _start_work_session(self) -> None:
         self._total_work_seconds = self.work_mins * 60
         self.seconds_left = self._total_work_seconds
-        self.title = ""
         self.state = TimerState.RUNNING
         self._blink_state = False
-        self._last_work_tick = time.time()
+        now = _now()
+        self._deadline = now + self.seconds_left
         self.start_button.title = "Pause"
         self.start_button.set_callback(self.start)
         self.stop_button.set_callback(self.stop)
-        self.time_left_item.title = _fmt(self.seconds_left) + " remaining"
+        self._set_time_left()
         self.time_left_item._menuitem.setHidden_(False)
-        self._update_tomato_icon()
-        self.timer.start()
+        self._start_timers(now)
 
     # -- Settings callbacks ---------------------------------------------------
 
-    def _set_duration(self, sender, menu: rumps.MenuItem, attr: str) -> None:
+    def _set_duration(self, sender, attr: str, selected_attr: str) -> None:
         mins = int(sender.title.split()[0])
         setattr(self, attr, mins)
-        for item in menu.values():
-            item.state = item.title == sender.title
+        previous = getattr(self, selected_attr)
+        if previous is not None:
+            previous.state = False
+        sender.state = True
+        setattr(self, selected_attr, sender)
 
     def set_work(self, sender) -> None:
         old_total = self._total_work_seconds
-        self._set_duration(sender, self.work_menu, "work_mins")
+        self._set_duration(sender, "work_mins", "_work_selected")
         new_total = self.work_mins * 60
         self._total_work_seconds = new_total
-        if self.state in (TimerState.RUNNING, TimerState.PAUSED):
-            elapsed = old_total - self.seconds_left
-            self.seconds_left = max(new_total - elapsed, 0)
+        if self._end_timer is not None:
+            now = _now()
+            elapsed = old_total - (self._deadline - now)
+            self._deadline = now + max(new_total - elapsed, 0.0)
+            self._cancel_timers()
+            self._start_timers(now)
+        elif self.state == TimerState.PAUSED:
+            elapsed = old_total - self._paused_remaining
+            self._paused_remaining = max(new_total - elapsed, 0.0)
+            self.seconds_left = math.ceil(self._paused_remaining)
+            self._set_time_left()
             self._update_tomato_icon()
 
     def set_break(self, sender) -> None:
-        old_total = self.break_mins * 60
-        self._set_duration(sender, self.break_menu, "break_mins")
+        old_total = self._break_total_seconds
+        self._set_duration(sender, "break_mins", "_break_selected")
+        new_total = self.break_mins * 60
+        self._break_total_seconds = new_total
         if self._break_overlay and self._break_overlay._active:
             elapsed = old_total - self._break_overlay.seconds_left
-            self._break_overlay.seconds_left = max(self.break_mins * 60 - elapsed, 0)
-            self._break_overlay._deadline = time.time() + self._break_overlay.seconds_left
+            self._break_overlay.seconds_left = max(new_total - elapsed, 0)
+            self._break_overlay._deadline = _now() + self._break_overlay.seconds_left
             if self._break_overlay._label:
                 self._break_overlay._label.setStringValue_(
                     _fmt(self._break_overlay.seconds_left),
@@ -279,28 +431,31 @@ class BreakOverlay:
         self.seconds_left = break_seconds
         self.on_complete = on_complete
         self.on_skip = on_skip
-        self._tint_windows: list[NSWindow] = []
+        self._tint_windows: tuple[NSWindow, ...] = ()
         self._timer_window = None
         self._button_window = None
         self._label = None
         self._button_target = None
         self._tick_timer = None
-        self._mouse_monitor = None
         self._punished_until = 0.0
         self._last_mouse_pos = None
+        self._armed_at = 0.0
         self._active = False
         self._deadline = 0.0
         self._last_tick_time = 0.0
+        self._last_input_check = 0.0
 
     def show(self):
         self._active = True
-        self._deadline = time.time() + self.seconds_left
-        self._last_tick_time = time.time()
+        now = _now()
+        self._deadline = now + self.seconds_left
+        self._last_tick_time = now
+        self._last_input_check = now
+        self._armed_at = now + ARM_DELAY
 
-        for screen in NSScreen.screens():
-            self._tint_windows.append(
-                _create_tint_window(screen.frame(), RED_OVERLAY_COLOR),
-            )
+        self._tint_windows = _tint_windows(RED_OVERLAY_COLOR)
+        for w in self._tint_windows:
+            w.orderFrontRegardless()
 
         self._timer_window, self._label = _create_timer_window(
             _fmt(self.seconds_left),
@@ -312,57 +467,50 @@ class BreakOverlay:
             "I hate myself", self._button_target,
         )
 
-        self._tick_timer = (
-            FoundationTimer.scheduledTimerWithTimeInterval_repeats_block_(
-                1.0, True, lambda _: self._tick(),
-            )
-        )
+        self._tick_timer = _schedule_timer(1.0, True, self._tick, TICK_TOLERANCE)
 
-        FoundationTimer.scheduledTimerWithTimeInterval_repeats_block_(
-            ARM_DELAY, False, lambda _: self._arm_mouse(),
-        )
-
-    def _arm_mouse(self):
-        if not self._active:
-            return
-        self._last_mouse_pos = NSEvent.mouseLocation()
-        self._mouse_monitor = (
-            NSEvent.addGlobalMonitorForEventsMatchingMask_handler_(
-                MOUSE_MOVE_MASK, self._on_mouse_move,
-            )
-        )
-
-    def _on_mouse_move(self, event):
-        if not self._active:
-            return
+    def _mouse_moved(self, now: float) -> bool:
+        if not self._last_mouse_pos:
+            # The first tick past ARM_DELAY only records where the mouse rests
+            if now >= self._armed_at:
+                self._last_mouse_pos = NSEvent.mouseLocation()
+            return False
         pos = NSEvent.mouseLocation()
-        if self._last_mouse_pos:
-            dx = abs(pos.x - self._last_mouse_pos.x)
-            dy = abs(pos.y - self._last_mouse_pos.y)
-            if dx > MOUSE_THRESHOLD or dy > MOUSE_THRESHOLD:
-                self._punished_until = time.time() + PUNISHMENT_SECS
-                if self._label:
-                    self._label.setTextColor_(NSColor.redColor())
+        dx = abs(pos.x - self._last_mouse_pos.x)
+        dy = abs(pos.y - self._last_mouse_pos.y)
         self._last_mouse_pos = pos
+        return dx > MOUSE_THRESHOLD or dy > MOUSE_THRESHOLD
+
+    def _check_input(self, now: float):
+        # Any key since the last check counts, including ones typed while a
+        # punishment was running and we weren't looking
+        since_key = CGEventSourceSecondsSinceLastEventType(
+            _CG_EVENT_SOURCE_STATE_HID, _CG_EVENT_KEY_DOWN,
+        )
+        if since_key < now - self._last_input_check:
+            self._punish(now)
+        if self._mouse_moved(now):
+            self._punish(now)
+        self._last_input_check = now
+
+    def _punish(self, now: float):
+        self._punished_until = now + PUNISHMENT_SECS
+        if self._label:
+            self._label.setTextColor_(_RED)
 
     def _tick(self):
         if not self._active:
             return
-        now = time.time()
+        now = _now()
         elapsed = now - self._last_tick_time
         self._last_tick_time = now
-        since_key = CGEventSourceSecondsSinceLastEventType(
-            _CG_EVENT_SOURCE_STATE_HID, _CG_EVENT_KEY_DOWN,
-        )
-        if since_key < 1.0:
-            self._punished_until = now + PUNISHMENT_SECS
-            if self._label:
-                self._label.setTextColor_(NSColor.redColor())
+        if now >= self._punished_until:
+            self._check_input(now)
         if now < self._punished_until:
             self._deadline += elapsed
             return
         if self._label:
-            self._label.setTextColor_(NSColor.whiteColor())
+            self._label.setTextColor_(_WHITE)
         self.seconds_left = max(0, int(self._deadline - now))
         if self._label:
             self._label.setStringValue_(_fmt(self.seconds_left))
@@ -383,12 +531,9 @@ class BreakOverlay:
         if self._tick_timer:
             self._tick_timer.invalidate()
             self._tick_timer = None
-        if self._mouse_monitor:
-            NSEvent.removeMonitor_(self._mouse_monitor)
-            self._mouse_monitor = None
         for w in self._tint_windows:
             w.orderOut_(None)
-        self._tint_windows.clear()
+        self._tint_windows = ()
         if self._timer_window:
             self._timer_window.orderOut_(None)
             self._timer_window = None
@@ -405,7 +550,7 @@ class BreakOverlay:
 class GreenOverlay:
     def __init__(self, on_dismiss):
         self.on_dismiss = on_dismiss
-        self._tint_windows: list[NSWindow] = []
+        self._tint_windows: tuple[NSWindow, ...] = ()
         self._timer_window = None
         self._label = None
         self._mouse_monitor = None
@@ -414,16 +559,13 @@ class GreenOverlay:
     def show(self):
         self._active = True
 
-        for screen in NSScreen.screens():
-            self._tint_windows.append(
-                _create_tint_window(screen.frame(), GREEN_OVERLAY_COLOR),
-            )
+        self._tint_windows = _tint_windows(GREEN_OVERLAY_COLOR)
+        for w in self._tint_windows:
+            w.orderFrontRegardless()
 
         self._timer_window, self._label = _create_timer_window("0:00")
 
-        FoundationTimer.scheduledTimerWithTimeInterval_repeats_block_(
-            ARM_DELAY, False, lambda _: self._arm_mouse(),
-        )
+        _schedule_timer(ARM_DELAY, False, self._arm_mouse, ARM_TOLERANCE)
 
     def _arm_mouse(self):
         if not self._active:
@@ -450,7 +592,7 @@ class GreenOverlay:
             self._mouse_monitor = None
         for w in self._tint_windows:
             w.orderOut_(None)
-        self._tint_windows.clear()
+        self._tint_windows = ()
         if self._timer_window:
             self._timer_window.orderOut_(None)
             self._timer_window = None
@@ -460,66 +602,234 @@ class GreenOverlay:
 # -- AppKit helpers -----------------------------------------------------------
 
 
-class _ButtonTarget(NSObject):
-    def pressed_(self, sender):
-        cb = getattr(self, "_py_callback", None)
-        if cb:
-            cb()
+def _load_frameworks() -> None:
+    # Binds the PyObjC names this module uses as globals. Only the --run
+    # process calls this: loading the frameworks dominates startup, and the
+    # launcher side of main() has no use for them.
+    global rumps, NSApplicationDidChangeScreenParametersNotification
+    global NSBackingStoreBuffered, NSButton, NSColor, NSEvent, NSFloatingWindowLevel
+    global NSFont, NSImage, NSImageCacheAlways, NSScreen, NSSound, NSTextField, NSView
+    global NSWindow, NSWindowDidChangeOcclusionStateNotification
+    global NSWindowOcclusionStateVisible, NSWindowStyleMaskBorderless, NSWorkspace
+    global NSWorkspaceDidWakeNotification, NSWorkspaceWillSleepNotification
+    global NSDate, NSDefaultRunLoopMode, NSNotificationCenter, NSObject, NSRunLoop
+    global FoundationTimer
+    global CGBitmapContextCreate, CGBitmapContextCreateImage
+    global CGColorSpaceCreateDeviceRGB, CGContextAddArc, CGContextAddPath
+    global CGContextClearRect, CGContextClosePath, CGContextFillEllipseInRect
+    global CGContextFillPath, CGContextMoveToPoint, CGContextScaleCTM
+    global CGContextSetLineWidth, CGContextSetRGBFillColor, CGContextSetRGBStrokeColor
+    global CGContextStrokeEllipseInRect, CGEventSourceSecondsSinceLastEventType
+    global CGPathAddLineToPoint, CGPathCloseSubpath, CGPathCreateMutable
+    global CGPathMoveToPoint, kCGImageAlphaPremultipliedLast
+    global _RED, _WHITE, _TINT_COLORS
+    global _ButtonTarget, _MenuDelegate, _NotificationTarget
+
+    import rumps
+    from AppKit import (
+        NSApplicationDidChangeScreenParametersNotification,
+        NSBackingStoreBuffered,
+        NSButton,
+        NSColor,
+        NSEvent,
+        NSFloatingWindowLevel,
+        NSFont,
+        NSImage,
+        NSImageCacheAlways,
+        NSScreen,
+        NSSound,
+        NSTextField,
+        NSView,
+        NSWindow,
+        NSWindowDidChangeOcclusionStateNotification,
+        NSWindowOcclusionStateVisible,
+        NSWindowStyleMaskBorderless,
+        NSWorkspace,
+        NSWorkspaceDidWakeNotification,
+        NSWorkspaceWillSleepNotification,
+    )
+    from Foundation import (
+        NSDate,
+        NSDefaultRunLoopMode,
+        NSNotificationCenter,
+        NSObject,
+        NSRunLoop,
+        NSTimer as FoundationTimer,
+    )
+    from Quartz import (
+        CGBitmapContextCreate,
+        CGBitmapContextCreateImage,
+        CGColorSpaceCreateDeviceRGB,
+        CGContextAddArc,
+        CGContextAddPath,
+        CGContextClearRect,
+        CGContextClosePath,
+        CGContextFillEllipseInRect,
+        CGContextFillPath,
+        CGContextMoveToPoint,
+        CGContextScaleCTM,
+        CGContextSetLineWidth,
+        CGContextSetRGBFillColor,
+        CGContextSetRGBStrokeColor,
+        CGContextStrokeEllipseInRect,
+        CGEventSourceSecondsSinceLastEventType,
+        CGPathAddLineToPoint,
+        CGPathCloseSubpath,
+        CGPathCreateMutable,
+        CGPathMoveToPoint,
+        kCGImageAlphaPremultipliedLast,
+    )
+
+    # Colours used on the tick paths, fetched across the bridge once
+    _RED = NSColor.redColor()
+    _WHITE = NSColor.whiteColor()
+    _TINT_COLORS = {
+        color: NSColor.colorWithRed_green_blue_alpha_(*color)
+        for color in (RED_OVERLAY_COLOR, GREEN_OVERLAY_COLOR)
+    }
+
+    class _ButtonTarget(NSObject):
+        def pressed_(self, sender):
+            cb = getattr(self, "_py_callback", None)
+            if cb:
+                cb()
+
+    class _MenuDelegate(NSObject):
+        def menuWillOpen_(self, menu):
+            cb = getattr(self, "_py_callback", None)
+            if cb:
+                cb()
+
+    class _NotificationTarget(NSObject):
+        def notified_(self, notification):
+            cb = getattr(self, "_py_callback", None)
+            if cb:
+                cb()
+
+
+def _make_app() -> PomodoroApp:
+    _load_frameworks()
+
+    class App(PomodoroApp, rumps.App):
+        pass
+
+    return App()
+
+
+def _observe(center, name: str, callback, obj=None) -> _NotificationTarget:
+    # The center doesn't retain observers — keep the returned target alive
+    target = _NotificationTarget.alloc().init()
+    target._py_callback = callback
+    center.addObserver_selector_name_object_(target, "notified:", name, obj)
+    return target
+
+
+def _schedule_timer(
+    interval: float, repeats: bool, callback, tolerance: float,
+    start: float | None = None,
+) -> FoundationTimer:
+    # NSTimer's tolerance is GCD leeway underneath: this is the run-loop
+    # version of dispatch_source_set_timer(start, interval, leeway)
+    fire_date = NSDate.dateWithTimeIntervalSinceNow_(
+        interval if start is None else start,
+    )
+    timer = FoundationTimer.alloc().initWithFireDate_interval_repeats_block_(
+        fire_date, interval, repeats, lambda _: callback(),
+    )
+    timer.setTolerance_(tolerance)
+    NSRunLoop.currentRunLoop().addTimer_forMode_(timer, NSDefaultRunLoopMode)
+    return timer
+
+
+def _now() -> float:
+    # Unlike time.monotonic() (mach_absolute_time), macOS's CLOCK_MONOTONIC
+    # keeps counting while asleep, which the sleep-as-break check relies on.
+    return time.clock_gettime(time.CLOCK_MONOTONIC)
+
+
+# Every value the longest work session can show, formatted once
+_FMT_CACHE = tuple(
+    f"{t // 60}:{t % 60:02d}" for t in range(max(WORK_DURATION_OPTIONS) * 60 + 1)
+)
 
 
 def _fmt(seconds: int) -> str:
-    m, s = divmod(max(seconds, 0), 60)
+    seconds = max(seconds, 0)
+    if seconds < len(_FMT_CACHE):
+        return _FMT_CACHE[seconds]
+    m, s = divmod(seconds, 60)
     return f"{m}:{s:02d}"
 
 
-def _create_tomato_icon(fraction: float) -> NSImage:
-    s = 18
-    image = NSImage.alloc().initWithSize_((s, s))
-    image.lockFocus()
+@functools.lru_cache(maxsize=128)
+def _tomato_icon_cached(bucket: int) -> NSImage:
+    image = _create_tomato_icon(bucket / ICON_STEPS)
+    image.setCacheMode_(NSImageCacheAlways)
+    return image
 
-    cx, cy = 9.0, 7.0
-    r = 6.5
-    body_rect = ((cx - r, cy - r), (r * 2, r * 2))
 
-    if fraction >= 0.99:
-        NSColor.redColor().setFill()
-        NSBezierPath.bezierPathWithOvalInRect_(body_rect).fill()
-    elif fraction > 0.01:
-        NSColor.colorWithRed_green_blue_alpha_(0.6, 0.0, 0.0, 0.2).setFill()
-        NSBezierPath.bezierPathWithOvalInRect_(body_rect).fill()
+# Tomato geometry is fixed; only the pie wedge depends on the fraction
+_ICON_SIZE = 18
+_ICON_SCALE = 2  # render at 2x so the icon stays crisp on Retina menu bars
+_ICON_CX, _ICON_CY = 9.0, 7.0
+_ICON_R = 6.5
+_BODY_RECT = ((_ICON_CX - _ICON_R, _ICON_CY - _ICON_R), (_ICON_R * 2, _ICON_R * 2))
+
+
+@functools.cache
+def _stem_path():
+    cx, top = _ICON_CX, _ICON_CY + _ICON_R
+    stem = CGPathCreateMutable()
+    CGPathMoveToPoint(stem, None, cx, top)
+    CGPathAddLineToPoint(stem, None, cx - 2, top + 3.5)
+    CGPathAddLineToPoint(stem, None, cx, top + 1.5)
+    CGPathAddLineToPoint(stem, None, cx + 2, top + 3.5)
+    CGPathCloseSubpath(stem)
+    return stem
+
+
+@functools.cache
+def _icon_context():
+    px = _ICON_SIZE * _ICON_SCALE
+    ctx = CGBitmapContextCreate(
+        None, px, px, 8, 0, CGColorSpaceCreateDeviceRGB(),
+        kCGImageAlphaPremultipliedLast,
+    )
+    CGContextScaleCTM(ctx, _ICON_SCALE, _ICON_SCALE)
+    return ctx
 
-        NSGraphicsContext.saveGraphicsState()
-        NSBezierPath.bezierPathWithOvalInRect_(body_rect).addClip()
 
-        end_angle = 90 - fraction * 360
-        pie = NSBezierPath.bezierPath()
-        pie.moveToPoint_((cx, cy))
-        pie.appendBezierPathWithArcWithCenter_radius_startAngle_endAngle_clockwise_(
-            (cx, cy), r, 90, end_angle, True,
-        )
-        pie.closePath()
-        NSColor.redColor().setFill()
-        pie.fill()
+def _create_tomato_icon(fraction: float) -> NSImage:
+    ctx = _icon_context()
+    CGContextClearRect(ctx, ((0, 0), (_ICON_SIZE, _ICON_SIZE)))
 
-        NSGraphicsContext.restoreGraphicsState()
+    if fraction >= 0.99:
+        CGContextSetRGBFillColor(ctx, *_ICON_RED)
+        CGContextFillEllipseInRect(ctx, _BODY_RECT)
+    elif fraction > 0.01:
+        CGContextSetRGBFillColor(ctx, *_ICON_DARK_RED)
+        CGContextFillEllipseInRect(ctx, _BODY_RECT)
+
+        # The wedge is a sector of the body circle, so it needs no clip
+        cx, cy = _ICON_CX, _ICON_CY
+        end_angle = math.radians(90 - fraction * 360)
+        CGContextMoveToPoint(ctx, cx, cy)
+        CGContextAddArc(ctx, cx, cy, _ICON_R, math.pi / 2, end_angle, 1)
+        CGContextClosePath(ctx)
+        CGContextSetRGBFillColor(ctx, *_ICON_RED)
+        CGContextFillPath(ctx)
     else:
-        NSColor.colorWithRed_green_blue_alpha_(0.6, 0.0, 0.0, 0.2).setStroke()
-        path = NSBezierPath.bezierPathWithOvalInRect_(body_rect)
-        path.setLineWidth_(1.0)
-        path.stroke()
-
-    NSColor.colorWithRed_green_blue_alpha_(0.2, 0.65, 0.2, 1.0).setFill()
-    stem = NSBezierPath.bezierPath()
-    stem.moveToPoint_((cx, cy + r))
-    stem.lineToPoint_((cx - 2, cy + r + 3.5))
-    stem.lineToPoint_((cx, cy + r + 1.5))
-    stem.lineToPoint_((cx + 2, cy + r + 3.5))
-    stem.closePath()
-    stem.fill()
-
-    image.unlockFocus()
-    image.setTemplate_(False)
-    return image
+        CGContextSetRGBStrokeColor(ctx, *_ICON_DARK_RED)
+        CGContextSetLineWidth(ctx, 1.0)
+        CGContextStrokeEllipseInRect(ctx, _BODY_RECT)
+
+    CGContextSetRGBFillColor(ctx, *_ICON_STEM_GREEN)
+    CGContextAddPath(ctx, _stem_path())
+    CGContextFillPath(ctx)
+
+    return NSImage.alloc().initWithCGImage_size_(
+        CGBitmapContextCreateImage(ctx), (_ICON_SIZE, _ICON_SIZE),
+    )
 
 
 def _create_tint_window(frame, color) -> NSWindow:
@@ -529,19 +839,46 @@ def _create_tint_window(frame, color) -> NSWindow:
     win.setLevel_(NSFloatingWindowLevel + 1)
     win.setOpaque_(False)
     win.setIgnoresMouseEvents_(True)
-    win.setBackgroundColor_(NSColor.colorWithRed_green_blue_alpha_(*color))
+    win.setBackgroundColor_(NSColor.clearColor())
     win.setCollectionBehavior_(CAN_JOIN_ALL_SPACES | FULL_SCREEN_AUXILIARY)
-    win.setContentView_(NSView.alloc().initWithFrame_(frame))
-    win.orderFrontRegardless()
+    # Let Core Animation composite the tint instead of Quartz filling it
+    view = NSView.alloc().initWithFrame_(frame)
+    view.setWantsLayer_(True)
+    view.layer().setBackgroundColor_(_TINT_COLORS[color].CGColor())
+    win.setContentView_(view)
     return win
 
 
-def _screen_with_mouse() -> NSScreen:
-    mouse = NSEvent.mouseLocation()
+@functools.cache
+def _tint_windows(color) -> tuple[NSWindow, ...]:
+    # One hidden window per screen, reused by every overlay of this colour
+    return tuple(
+        _create_tint_window(((x0, y0), (x1 - x0, y1 - y0)), color)
+        for _, x0, y0, x1, y1 in _screen_bounds()
+    )
+
+
+@functools.cache
+def _screen_bounds() -> tuple[tuple[NSScreen, float, float, float, float], ...]:
+    bounds = []
     for s in NSScreen.screens():
         f = s.frame()
-        if (f.origin.x <= mouse.x <= f.origin.x + f.size.width
-                and f.origin.y <= mouse.y <= f.origin.y + f.size.height):
+        x, y = f.origin.x, f.origin.y
+        bounds.append((s, x, y, x + f.size.width, y + f.size.height))
+    return tuple(bounds)
+
+
+def _screens_changed() -> None:
+    # Observed by PomodoroApp; everything derived from the display layout
+    _screen_bounds.cache_clear()
+    _tint_windows.cache_clear()
+
+
+def _screen_with_mouse() -> NSScreen:
+    mouse = NSEvent.mouseLocation()
+    mx, my = mouse.x, mouse.y
+    for s, x0, y0, x1, y1 in _screen_bounds():
+        if x0 <= mx <= x1 and y0 <= my <= y1:
             return s
     return NSScreen.mainScreen()
 
@@ -568,7 +905,7 @@ def _create_timer_window(text: str) -> tuple[NSWindow, NSTextField]:
             TIMER_FONT_SIZE, NS_FONT_WEIGHT_BOLD,
         ),
     )
-    label.setTextColor_(NSColor.whiteColor())
+    label.setTextColor_(_WHITE)
     label.setDrawsBackground_(False)
     label.setBordered_(False)
     label.setEditable_(False)
@@ -612,30 +949,48 @@ PLIST_LABEL = "com.pamplemousse"
 LAUNCH_AGENT = Path.home() / "Library" / "LaunchAgents" / f"{PLIST_LABEL}.plist"
 PID_FILE = Path.home() / ".pamplemousse.pid"
 
+# qos_class_t from <sys/qos.h>
+_QOS_CLASS_USER_INITIATED = 0x19
 
-def _install_launch_agent() -> None:
-    if LAUNCH_AGENT.exists():
-        return
-    import plistlib
 
-    exe = shutil.which("pamplemousse") or sys.executable
+@functools.cache
+def _libsystem() -> ctypes.CDLL:
+    lib = ctypes.CDLL("/usr/lib/libSystem.dylib")
+    lib.kill.argtypes = (ctypes.c_int, ctypes.c_int)
+    return lib
+
+
+@functools.cache
+def _pamplemousse_exe() -> str | None:
+    return shutil.which("pamplemousse")
+
+
+def _install_launch_agent() -> None:
+    exe = _pamplemousse_exe() or sys.executable
     args = [exe, "--run"] if exe != sys.executable else [exe, __file__, "--run"]
     plist = {"Label": PLIST_LABEL, "ProgramArguments": args, "RunAtLoad": True}
+    data = plistlib.dumps(plist)
+    try:
+        if LAUNCH_AGENT.read_bytes() == data:
+            return
+    except FileNotFoundError:
+        pass
     LAUNCH_AGENT.parent.mkdir(parents=True, exist_ok=True)
-    with open(LAUNCH_AGENT, "wb") as f:
-        plistlib.dump(plist, f)
+    LAUNCH_AGENT.write_bytes(data)
 
 
 def _get_running_pid() -> int | None:
     if not PID_FILE.exists():
         return None
-    try:
-        pid = int(PID_FILE.read_text().strip())
-        os.kill(pid, 0)
+    text = PID_FILE.read_text().strip()
+    # isdigit() alone also accepts digits like "²" that int() rejects
+    pid = int(text) if text.isascii() and text.isdigit() else 0
+    # Probe via kill(2) directly; pid_t is a C int, and EPERM means our pid
+    # was reused by another user's process, which is as stale as ESRCH
+    if 0 < pid < 2**31 and _libsystem().kill(pid, 0) == 0:
         return pid
-    except (ValueError, ProcessLookupError, PermissionError):
-        PID_FILE.unlink(missing_ok=True)
-        return None
+    PID_FILE.unlink(missing_ok=True)
+    return None
 
 
 def _stop(pid: int) -> None:
@@ -644,7 +999,7 @@ def _stop(pid: int) -> None:
 
 
 def _spawn() -> None:
-    exe = shutil.which("pamplemousse")
+    exe = _pamplemousse_exe()
     cmd = [exe, "--run"] if exe else [sys.executable, __file__, "--run"]
     proc = subprocess.Popen(
         cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
@@ -653,10 +1008,17 @@ def _spawn() -> None:
     PID_FILE.write_text(str(proc.pid))
 
 
+def _set_qos_user_initiated() -> None:
+    # Detached/launchd children can start at background QoS, which macOS
+    # throttles heavily; the menu bar app is something the user is waiting on
+    _libsystem().pthread_set_qos_class_self_np(_QOS_CLASS_USER_INITIATED, 0)
+
+
 def _run_app() -> None:
+    _set_qos_user_initiated()
     PID_FILE.write_text(str(os.getpid()))
     try:
-        PomodoroApp().run()
+        _make_app().run()
     finally:
         PID_FILE.unlink(missing_ok=True)
 
@@ -682,4 +1044,4 @@ def main():
 
 
 if __name__ == "__main__":
-    PomodoroApp().run()
+    main()